@@ -1,8 +1,9 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from redis_om import HashModel, get_redis_connection
+from redis.exceptions import WatchError
 from starlette.requests import Request
-import json
+import orjson
 from pydantic import BaseModel
 from subscriber import subscriptions
 app = FastAPI()
@@ -28,61 +29,131 @@ class Delivery(HashModel):
     class Meta:
         database = redis
 
-class Event(HashModel):
+# Events live only in the per-delivery stream; nothing reads them back as hashes
+class Event(BaseModel):
     delivery_id: str = None
     type: str
     data: str
 
-    class Meta:
-        database = redis
+# Max stream entries folded per XRANGE round trip
+EVENT_BATCH_SIZE = 256
+
+# Event fields the subscribers do arithmetic on, parsed once here so replay never re-parses;
+# budget is a float like Delivery.budget
+NUMERIC_FIELDS = {"budget": float, "quantity": int, "purchase_price": int, "sell_price": int}
+
+def coerce_numbers(data: dict):
+    for field, parse in NUMERIC_FIELDS.items():
+        if field in data:
+            try:
+                data[field] = parse(data[field])
+            except (TypeError, ValueError):
+                raise HTTPException(status_code=400, detail=f"{field} must be a number")
+    return data
+
+def state_key(pk: str):
+    return f"delivery:{pk}:state"
+
+def cursor_key(pk: str):
+    return f"delivery:{pk}:cursor"
+
+def events_key(pk: str):
+    return f"delivery:{pk}:events"
+
+def legacy_state_key(pk: str):
+    return f"delivery:{pk}"
 
 @app.get("/delivery/{pk}/status")
 def get_delivery_status(pk: str):
-    state = redis.get(f"delivery:{pk}")
+    state = redis.get(state_key(pk))
 
-    if state is None:
-        return json.loads(state)
+    if state is not None:
+        return orjson.loads(state)
 
-    state = build_state(pk)
-    redis.set(f"delivery:{pk}", json.dumps(state))
-    return state
+    return build_state(pk)
 
-def build_state(pk: str):
-    pks = Event.all_pks()
-    events = [Event.get(pk) for pk in pks]
-    events = sorted(events, key=lambda x: x.created_at)
+# Appends the event and stores the snapshot folded up to it under the new stream id
+APPEND_EVENT_SCRIPT = """
+local id = redis.call('XADD', KEYS[1], '*', unpack(ARGV, 2))
+redis.call('SET', KEYS[2], ARGV[1])
+redis.call('SET', KEYS[3], id)
+return id
+"""
+append_event_script = redis.register_script(APPEND_EVENT_SCRIPT)
 
-    state = {}
-    for event in events:
-        state = subscriptions[event.type](state, event)
+def fold_events(pk: str):
+    # Fold only the events appended since the cached snapshot was stored
+    state, cursor = redis.mget(state_key(pk), cursor_key(pk))
+    last_applied = cursor
+    if state is None and cursor is None:
+        # Deliveries from before the stream only have a snapshot under delivery:{pk};
+        # adopt it at the start of the (empty) stream so the next save migrates it
+        state = redis.get(legacy_state_key(pk))
+        if state is not None:
+            cursor = "0-0"
+    state = orjson.loads(state) if state is not None else None
 
-    return state
+    while True:
+        start = f"({cursor}" if cursor else "-"
+        entries = redis.xrange(events_key(pk), start, "+", count=EVENT_BATCH_SIZE)
+        if not entries:
+            break
+        sub = subscriptions
+        loads = orjson.loads
+        for _, fields in entries:
+            state = sub[fields["type"]](state, loads(fields["data"]), pk)
+        cursor = entries[-1][0]
+
+    return state, cursor, last_applied
 
-    delivery = Delivery.get(pk)
-    state = {
-        "budget": delivery.budget,
-        "quantity": 0,
-        "status": "ready",
-    }
+def build_state(pk: str):
+    with redis.pipeline() as pipe:
+        pipe.watch(cursor_key(pk))
+        state, cursor, last_applied = fold_events(pk)
+        if cursor != last_applied:
+            try:
+                pipe.multi()
+                pipe.mset({state_key(pk): orjson.dumps(state), cursor_key(pk): cursor})
+                pipe.execute()
+            except WatchError:
+                # A newer snapshot was stored meanwhile; don't overwrite it
+                pass
     return state
 
+def apply_event(event: Event, data: dict):
+    pk = event.delivery_id
+    fields = [value for item in event.dict().items() for value in item]
+    with redis.pipeline() as pipe:
+        while True:
+            try:
+                # Any append or snapshot save after the fold aborts the EXEC and refolds
+                pipe.watch(cursor_key(pk), events_key(pk))
+                state, _, _ = fold_events(pk)
+                state = subscriptions[event.type](state, data, pk)
+                pipe.multi()
+                append_event_script(
+                    keys=[events_key(pk), state_key(pk), cursor_key(pk)],
+                    args=[orjson.dumps(state), *fields],
+                    client=pipe,
+                )
+                pipe.execute()
+                return state
+            except WatchError:
+                continue
+
 @app.post("/delivery")
 async def create(request: Request):
     body = await request.json()
+    coerce_numbers(body["data"])
     delivery = Delivery(budget=body["data"]["budget"], notes=body["data"]["notes"])
     delivery.save()
-    event = Event(delivery_id=delivery.pk, type=body["type"], data=json.dumps(body["data"]))
-    event.save()
-    state = subscriptions[event.type](state=None, event=event)      
-    redis.set(f"delivery:{delivery.pk}", json.dumps(state))
-    return state
+    event = Event(delivery_id=delivery.pk, type=body["type"], data=orjson.dumps(body["data"]).decode())
+    return apply_event(event, body["data"])
 
 @app.post("/event")
 async def dispatch(request: Request):
     body = await request.json()
+    coerce_numbers(body["data"])
     delivery_id = body["data"]["delivery_id"]
-    state = await get_delivery_status(delivery_id)
-    event = Event(delivery_id=delivery_id, type=body["type"], data=json.dumps(body["data"]))
-    new_state = subscriptions[event.type](state=state, event=event)
-    redis.set(f"delivery:{delivery_id}", json.dumps(new_state))
-    return new_state
\ No newline at end of file
+    event = Event(delivery_id=delivery_id, type=body["type"], data=orjson.dumps(body["data"]).decode())
+    return apply_event(event, body["data"])
\ No newline at end of file
@@ -1,55 +1,48 @@
-import json
 from fastapi import HTTPException
 
-def create_delivery(state, event):
-    data = json.loads(event.data)
+def create_delivery(state, data, delivery_id):
     return {
-        "id": event.delivery_id,
+        "id": delivery_id,
         "budget": data["budget"],
         "notes": data["notes"],
         "status": "ready",
     }
 
-def start_delivery(state, event):
+def start_delivery(state, data, delivery_id):
     if state["status"] != "ready":
         raise HTTPException(status_code=400, detail="Delivery already started")
 
-    return state | {
-        "status": "active",
-    }
+    state["status"] = "active"
+    return state
 
-def pickup_order(state, event):
-    data = json.loads(event.data)
-    new_budget = state["budget"] - int(data["budget"]) * int(data["quantity"])
+def pickup_order(state, data, delivery_id):
+    quantity = data["quantity"]
+    new_budget = state["budget"] - data["budget"] * quantity
     if new_budget < 0:
         raise HTTPException(status_code=400, detail="Not enough budget")
 
-    return state | {
-        "budget": new_budget,
-        "purchase_price": int(data["purchase_price"]),
-        "quantity": int(data["quantity"]),
-        "status": "collected",
-    }
+    state["budget"] = new_budget
+    state["purchase_price"] = data["purchase_price"]
+    state["quantity"] = quantity
+    state["status"] = "collected"
+    return state
 
-def deliver_products(state, event):
-    data = json.loads(event.data)
-    new_budget = state["budget"] + int(data["purchase_price"]) * int(data["quantity"])
-    new_quantity = state["quantity"] - int(data["quantity"])
+def deliver_products(state, data, delivery_id):
+    quantity = data["quantity"]
+    new_budget = state["budget"] + data["purchase_price"] * quantity
+    new_quantity = state["quantity"] - quantity
     if new_quantity < 0:
         raise HTTPException(status_code=400, detail="Not enough quantity")
 
-    return state | {
-        "budget": new_budget,
-        "sell_price": int(data["sell_price"]),
-        "quantity": new_quantity,
-        "status": "delivered",
-    }
+    state["budget"] = new_budget
+    state["sell_price"] = data["sell_price"]
+    state["quantity"] = new_quantity
+    state["status"] = "delivered"
+    return state
 
-def increase_budget(state, event):
-    data = json.loads(event.data)
-    return state | {
-        "budget": state["budget"] + int(data["budget"]),
-    }
+def increase_budget(state, data, delivery_id):
+    state["budget"] += data["budget"]
+    return state
 
 subscriptions = {
     "CREATE_DELIVERY": create_delivery,
@@ -1,28 +1,49 @@
 from main import redis, Product
+from redis.exceptions import ResponseError
 import time
 
 key = 'order_completed'
 group = 'inventory_group'
+consumer = 'inventory_consumer'
 
 try:
-    redis.xgroup_create(key, group)
-except:
+    redis.xgroup_create(key, group, mkstream=True)
+except ResponseError as e:
+    if "BUSYGROUP" not in str(e):
+        raise
     print("Group already exists!")
 
 while True:
     try:
-        results = redis.xreadgroup(group, key, {key: ">"}, None)
+        # Block until new orders arrive instead of polling
+        results = redis.xreadgroup(group, consumer, {key: ">"}, count=64, block=0)
         if results:
-            for result in results:
-                obj = result[1][0][1]
-                product = Product.get(obj["product_id"])
-                if product and product.quantity >= obj["quantity"]:
-                    product.quantity -= obj["quantity"]
-                    product.save()
+            orders = [obj for _, obj in results[0][1]]
+
+            product_ids = list({obj["product_id"] for obj in orders})
+            pipe = redis.pipeline(transaction=False)
+            for product_id in product_ids:
+                pipe.hgetall(Product.make_primary_key(product_id))
+            products = {
+                product_id: Product(**row)
+                for product_id, row in zip(product_ids, pipe.execute())
+                if row
+            }
+
+            pipe = redis.pipeline(transaction=False)
+            for obj in orders:
+                quantity = int(obj["quantity"])
+                product = products.get(obj["product_id"])
+                if product and product.quantity >= quantity:
+                    product.quantity -= quantity
                 else:
-                    redis.xadd("refund_order", obj, "*")
+                    pipe.xadd("refund_order", obj, "*")
+            for product in products.values():
+                product.save(pipeline=pipe)
+            pipe.execute()
     except Exception as e:
         print(str(e))
-    time.sleep(1)
+        # block=0 returns immediately on errors, so back off instead of spinning
+        time.sleep(1)
 
 
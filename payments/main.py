@@ -3,7 +3,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.background import BackgroundTasks
 from redis_om import HashModel, get_redis_connection
 from starlette.requests import Request
-import requests
+import httpx
 
 app = FastAPI()
 
@@ -21,6 +21,19 @@ redis = get_redis_connection(
     decode_responses=True
 )
 
+@app.on_event("startup")
+async def startup():
+    # Shared client so inventory lookups reuse keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        base_url="http://inventory:8000",
+        timeout=5.0,
+        limits=httpx.Limits(max_keepalive_connections=64),
+    )
+
+@app.on_event("shutdown")
+async def shutdown():
+    await app.state.http.aclose()
+
 class Order(HashModel):
     product_id: str
     price: float
@@ -39,7 +52,7 @@ def get(pk: str):
 @app.post("/orders")
 async def create(request: Request, background_tasks: BackgroundTasks):
     body = await request.json()
-    req = requests.get(f"http://inventory:8000/products/{body['product_id']}")
+    req = await app.state.http.get(f"/products/{body['product_id']}")
     product = req.json()
     order = Order(
         product_id=body['product_id'],
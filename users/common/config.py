@@ -1,3 +1,4 @@
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 import os
 
@@ -6,6 +7,29 @@ class Settings(BaseSettings):
     RATE_LIMIT_WINDOW: int = os.getenv("RATE_LIMIT_WINDOW")
     REDIS_URL: str = os.getenv("REDIS_URL")
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    DB_POOL_MIN_SIZE: int = os.getenv("DB_POOL_MIN_SIZE", 5)
+    DB_POOL_MAX_SIZE: int = os.getenv("DB_POOL_MAX_SIZE", 20)
+    DB_POOL_TIMEOUT: float = os.getenv("DB_POOL_TIMEOUT", 30.0)
+    # Connections all workers together may open; leaves headroom under Postgres' default of 100
+    DB_MAX_CONNECTIONS: int = os.getenv("DB_MAX_CONNECTIONS", 80)
+    # Worker processes sharing that budget (also read by uvicorn as its --workers default)
+    WEB_CONCURRENCY: int = os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)
+
+    @model_validator(mode="after")
+    def check_pool_sizes(self):
+        if self.DB_POOL_MIN_SIZE > self.DB_POOL_MAX_SIZE:
+            raise ValueError("DB_POOL_MIN_SIZE must not exceed DB_POOL_MAX_SIZE")
+        return self
+
+    @property
+    def db_pool_max_size(self) -> int:
+        """Per-worker pool cap, so every worker's pool fits in DB_MAX_CONNECTIONS"""
+        return max(1, min(self.DB_POOL_MAX_SIZE, self.DB_MAX_CONNECTIONS // self.WEB_CONCURRENCY))
+
+    @property
+    def db_pool_min_size(self) -> int:
+        return min(self.DB_POOL_MIN_SIZE, self.db_pool_max_size)
 
     class Config:
         env_file = ".env"
@@ -1,17 +1,27 @@
-from redis import Redis
-from datetime import datetime
-import json
-from typing import Any, Callable, Dict, List
+from redis.asyncio import Redis
+from datetime import datetime, timezone
+import msgspec
+from typing import Any, Callable, Dict, List, Union
 from enum import Enum
 from dataclasses import dataclass
 import asyncio
+import logging
 
-@dataclass
-class Event:
-    type: str
+logger = logging.getLogger("users.events")
+
+def _enc_hook(obj: Any):
+    """Serialize pydantic models published as event data"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    raise NotImplementedError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+class Event(msgspec.Struct, tag_field="type"):
+    """Base for event messages; each subclass is tagged with its event type"""
     data: Dict[str, Any]
     timestamp: datetime
 
+_encoder = msgspec.json.Encoder(enc_hook=_enc_hook)
+
 @dataclass
 class EventMetadata:
     name: str
@@ -24,7 +34,8 @@ class Topics:
     EMAILS = "emails"
 
 class EventType:
-    pass
+    _event_set: frozenset = frozenset()
+    _messages: Dict[str, type] = {}
 
 class UserEvents(EventType):
     REGISTERED = "user.registered"
@@ -74,10 +85,7 @@ class UserEvents(EventType):
     @classmethod
     def list_events(cls) -> List[str]:
         """Return list of all event types"""
-        return [
-            event for event in vars(cls) 
-            if not event.startswith('_') and isinstance(getattr(cls, event), str)
-        ]
+        return list(cls._event_set)
 
     @classmethod
     def get_event_metadata(cls, event_type: str) -> EventMetadata:
@@ -94,7 +102,7 @@ class UserEvents(EventType):
         """Create an event with standard format"""
         return {
             "type": event_type,
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.now(timezone.utc),
             "version": "1.0",
             "data": data
         }
@@ -127,6 +135,32 @@ class UserEvents(EventType):
             "data": {"user_id": user_id}
         }
 
+UserEvents._event_set = frozenset({
+    UserEvents.REGISTERED,
+    UserEvents.DEACTIVATED,
+    UserEvents.LOGIN,
+    UserEvents.LOGOUT,
+})
+
+class UserRegistered(Event, tag=UserEvents.REGISTERED):
+    pass
+
+class UserDeactivated(Event, tag=UserEvents.DEACTIVATED):
+    pass
+
+class UserLogin(Event, tag=UserEvents.LOGIN):
+    pass
+
+class UserLogout(Event, tag=UserEvents.LOGOUT):
+    pass
+
+UserEvents._messages = {
+    UserEvents.REGISTERED: UserRegistered,
+    UserEvents.DEACTIVATED: UserDeactivated,
+    UserEvents.LOGIN: UserLogin,
+    UserEvents.LOGOUT: UserLogout,
+}
+
 class EventPublisher:
     def __init__(self, event_types: EventType, redis_client: Redis, channel: str = "users"):
         self.event_types = event_types
@@ -134,14 +168,10 @@ class EventPublisher:
         self.channel = channel
 
     async def publish(self, event_type: str, data: Any):
-        if event_type not in self.event_types.list_events():
+        if event_type not in self.event_types._event_set:
             raise ValueError(f"Invalid event type: {event_type}")
-        message = {
-            "type": event_type,
-            "data": data,
-            "timestamp": datetime.now().isoformat()
-        }
-        await self.redis.publish(self.channel, json.dumps(message))
+        message = self.event_types._messages[event_type](data=data, timestamp=datetime.now(timezone.utc))
+        await self.redis.publish(self.channel, _encoder.encode(message))
 
 class EventSubscriber:
     def __init__(self, event_types: EventType, redis_client: Redis, channel: str = "users"):
@@ -149,6 +179,9 @@ class EventSubscriber:
         self.redis = redis_client
         self.channel = channel
         self.handlers: Dict[str, Callable] = {}
+        # Handlers keyed by message class, so dispatch is on type(event)
+        self._handlers_by_type: Dict[type, Callable] = {}
+        self._decoder = msgspec.json.Decoder(Union[tuple(event_types._messages.values())])
 
     def register_event_types(self):
         for event in self.event_types.list_events():
@@ -156,6 +189,7 @@ class EventSubscriber:
 
     def register_handler(self, event_type: str, handler: Callable):
         self.handlers[event_type] = handler
+        self._handlers_by_type[self.event_types._messages[event_type]] = handler
 
     async def start_background(self):
         """Start subscriber in background task"""
@@ -176,15 +210,23 @@ class EventSubscriber:
             pubsub = self.redis.pubsub()
             await pubsub.subscribe(self.channel)
 
-            while True:
-                message = await pubsub.get_message(ignore_subscribe_messages=True)
-                if message:
-                    data = json.loads(message["data"])
-                    handler = self.handlers.get(data["type"])
-                    if handler:
-                        # Handle each message in a separate task
-                        asyncio.create_task(handler(data["data"]))
-                await asyncio.sleep(0.01)  # Prevent CPU spinning
+            decode = self._decoder.decode
+            handlers = self._handlers_by_type
+
+            # listen() wakes as soon as a message is pushed, no polling
+            async for message in pubsub.listen():
+                if message["type"] != "message":
+                    continue
+                try:
+                    event = decode(message["data"])
+                except msgspec.DecodeError as e:
+                    # Also covers ValidationError (unknown type, missing fields); skip, don't die
+                    logger.warning("Dropping undecodable message on %s: %s", self.channel, e)
+                    continue
+                handler = handlers.get(type(event))
+                if handler:
+                    # Handle each message in a separate task
+                    asyncio.create_task(handler(event.data))
         except asyncio.CancelledError:
             await pubsub.unsubscribe()
             raise
@@ -1,9 +1,10 @@
 import time
 import logging
-from typing import Callable
-from fastapi import Request, Response
+from fastapi import Request
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from datetime import datetime
-import json
+import orjson
 
 # Configure logging
 logging.basicConfig(
@@ -12,66 +13,78 @@ logging.basicConfig(
 )
 
 class LoggerMiddleware:
-    def __init__(self, app_name: str = "FastAPI"):
+    """Pure ASGI middleware logging each request and its response"""
+    def __init__(self, app: ASGIApp, app_name: str = "FastAPI", log_level=None):
+        self.app = app
         self.logger = logging.getLogger(app_name)
-        self.logger.setLevel(logging.INFO)
+        # Left unset, the logger inherits its level; DEBUG adds headers, above INFO skips logging
+        if log_level is not None:
+            self.logger.setLevel(log_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        # Skip building log records nobody will see
+        if scope["type"] != "http" or not self.logger.isEnabledFor(logging.INFO):
+            return await self.app(scope, receive, send)
+        log_headers = self.logger.isEnabledFor(logging.DEBUG)
 
-    async def __call__(self, request: Request, call_next: Callable) -> Response:
         # Start timer
         start_time = time.time()
         
         # Get request details
+        request = Request(scope)
         request_id = request.headers.get('X-Request-ID', str(time.time()))
         
         # Log request
-        self.logger.info(
-            json.dumps({
-                "request_id": request_id,
-                "type": "request",
-                "timestamp": datetime.now().isoformat(),
-                "method": request.method,
-                "url": str(request.url),
-                "headers": dict(request.headers),
-                "client_ip": request.client.host,
-                "path_params": request.path_params,
-            })
-        )
+        record = {
+            "request_id": request_id,
+            "type": "request",
+            "timestamp": datetime.now(),
+            "method": request.method,
+            "url": str(request.url),
+            "client_ip": request.client.host,
+            "path_params": request.path_params,
+        }
+        if log_headers:
+            record["headers"] = dict(request.headers)
+        self.logger.info(orjson.dumps(record).decode())
 
-        try:
-            # Process request
-            response = await call_next(request)
-            
-            # Calculate duration
-            duration = time.time() - start_time
-            
-            # Log response
-            self.logger.info(
-                json.dumps({
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Calculate duration
+                duration = time.time() - start_time
+                headers = MutableHeaders(scope=message)
+
+                # Log response
+                record = {
                     "request_id": request_id,
                     "type": "response",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": datetime.now(),
                     "duration": f"{duration:.3f}s",
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                })
-            )
+                    "status_code": message["status"],
+                }
+                if log_headers:
+                    record["headers"] = dict(headers)
+                self.logger.info(orjson.dumps(record).decode())
+
+                # Add custom headers
+                headers["X-Request-ID"] = request_id
+                headers["X-Process-Time"] = f"{duration:.3f}s"
+            await send(message)
 
-            # Add custom headers
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = f"{duration:.3f}s"
-            
-            return response
+        try:
+            # Process request
+            await self.app(scope, receive, send_with_headers)
 
         except Exception as e:
             # Log error
             self.logger.error(
-                json.dumps({
+                orjson.dumps({
                     "request_id": request_id,
                     "type": "error",
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": datetime.now(),
                     "duration": f"{time.time() - start_time:.3f}s",
                     "error": str(e),
                     "error_type": type(e).__name__,
-                })
+                }).decode()
             )
             raise
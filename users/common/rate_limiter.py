@@ -1,9 +1,20 @@
-from fastapi import Request, HTTPException
-from redis import Redis
-from typing import Callable, Optional
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from redis.asyncio import Redis
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import time
 from .config import settings
 
+# INCR the window counter and set its TTL on first hit, atomically
+INCR_WINDOW_SCRIPT = """
+local count = redis.call('INCR', KEYS[1])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return count
+"""
+
 class RateLimiter:
     def __init__(
         self,
@@ -16,31 +27,20 @@ class RateLimiter:
         self.requests = requests
         self.window = window
         self.prefix = prefix
+        self._incr_window = self.redis.register_script(INCR_WINDOW_SCRIPT)
+
+    async def is_rate_limited(self, key: str) -> tuple[bool, int, int]:
+        # Fixed window: one counter per client per window
+        bucket = int(time.time() // self.window)
+        request_count = await self._incr_window(keys=[f"{key}:{bucket}"], args=[self.window])
 
-    async def is_rate_limited(self, key: str) -> tuple[bool, Optional[int]]:
-        current = time.time()
-        window_start = current - self.window
-        
-        # Create a pipeline for atomic operations
-        pipe = self.redis.pipeline()
-        
-        # Remove old requests
-        pipe.zremrangebyscore(key, 0, window_start)
-        # Add current request
-        pipe.zadd(key, {str(current): current})
-        # Count requests in window
-        pipe.zcount(key, window_start, current)
-        # Set key expiration
-        pipe.expire(key, self.window)
-        
-        # Execute pipeline
-        _, _, request_count, _ = pipe.execute()
-        
         # Check if rate limit exceeded
         is_limited = request_count > self.requests
-        remaining = self.requests - request_count
-        
-        return is_limited, remaining
+        remaining = max(self.requests - request_count, 0)
+        # The counter resets when the current window ends
+        reset_at = (bucket + 1) * self.window
+
+        return is_limited, remaining, reset_at
 
     def get_key(self, request: Request) -> str:
         # You can customize this to rate limit by different factors
@@ -48,43 +48,43 @@ class RateLimiter:
         return f"{self.prefix}{request.client.host}"
 
 class RateLimitMiddleware:
+    """Pure ASGI middleware; reads the RateLimiter from app.state.rate_limiter"""
     def __init__(
         self,
-        redis_client: Redis,
-        requests_per_minute: int = 10
+        app: ASGIApp,
+        exempt_paths: tuple[str, ...] = ("/health", "/metrics")
     ):
-        self.limiter = RateLimiter(
-            redis_client=redis_client,
-            requests=requests_per_minute
-        )
+        self.app = app
+        self.exempt_paths = exempt_paths
 
-    async def __call__(
-        self,
-        request: Request,
-        call_next: Callable
-    ):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Skip rate limiting for certain paths (optional)
-        if request.url.path in ["/health", "/metrics"]:
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            return await self.app(scope, receive, send)
 
-        key = self.limiter.get_key(request)
-        is_limited, remaining = await self.limiter.is_rate_limited(key)
+        limiter: RateLimiter = scope["app"].state.rate_limiter
+        key = limiter.get_key(Request(scope))
+        is_limited, remaining, reset_at = await limiter.is_rate_limited(key)
 
         if is_limited:
-            raise HTTPException(
+            response = JSONResponse(
+                {"detail": "Too many requests"},
                 status_code=429,
-                detail="Too many requests",
                 headers={
-                    "Retry-After": str(self.limiter.window),
-                    "X-RateLimit-Remaining": str(0)
+                    "Retry-After": str(max(reset_at - int(time.time()), 1)),
+                    "X-RateLimit-Remaining": str(0),
+                    "X-RateLimit-Reset": str(reset_at)
                 }
             )
+            return await response(scope, receive, send)
+
+        async def send_with_headers(message: Message):
+            if message["type"] == "http.response.start":
+                # Add rate limit headers to response
+                headers = MutableHeaders(scope=message)
+                headers["X-RateLimit-Limit"] = str(limiter.requests)
+                headers["X-RateLimit-Remaining"] = str(remaining)
+                headers["X-RateLimit-Reset"] = str(reset_at)
+            await send(message)
 
-        response = await call_next(request)
-        
-        # Add rate limit headers to response
-        response.headers["X-RateLimit-Limit"] = str(self.limiter.requests)
-        response.headers["X-RateLimit-Remaining"] = str(remaining)
-        response.headers["X-RateLimit-Reset"] = str(int(time.time() + self.limiter.window))
-        
-        return response
+        await self.app(scope, receive, send_with_headers)
@@ -2,18 +2,26 @@ from enum import Enum
 from fastapi import (
     FastAPI, 
     HTTPException, 
-    Request, 
-    Depends
+    Depends,
+    Request,
+    Response
 )
-from pydantic import BaseModel, EmailStr, Field
-from redis import Redis
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 import uuid
+import hashlib
 from datetime import datetime
 from abc import ABC, abstractmethod
-from typing import Callable
+from typing import Final, Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import asyncio
 import asyncpg
-from common.rate_limiter import RateLimitMiddleware
+from contextlib import asynccontextmanager
+import logging
+import orjson
+from common.rate_limiter import RateLimiter, RateLimitMiddleware
 from common.logger import LoggerMiddleware
 from common.config import settings
 from common.events import (
@@ -30,20 +38,31 @@ class DatabaseClient:
         min_size: int = 5,
         max_size: int = 5,
         timeout: float = 30.0,
-        command_timeout: float = 30.0
+        command_timeout: float = 30.0,
+        statement_cache_size: int = 200,
+        max_cached_statement_lifetime: int = 0
     ):
         self.database_url = database_url
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.command_timeout = command_timeout
+        self.statement_cache_size = statement_cache_size
+        self.max_cached_statement_lifetime = max_cached_statement_lifetime
         self._pool = None
 
     async def initialize(self):
         """Initialize the connection pool"""
         self._pool = await asyncpg.create_pool(
             self.database_url,
-            min_size=5,          # Minimum connections in pool
-            max_size=5,          # Maximum connections in pool
-            timeout=30.0,        # Connection acquisition timeout
-            command_timeout=30.0, # Query execution timeout
-            max_inactive_connection_lifetime=300.0  # 5 minutes
+            min_size=self.min_size,                # Minimum connections in pool
+            max_size=self.max_size,                # Maximum connections in pool
+            timeout=self.timeout,                  # Connection acquisition timeout
+            command_timeout=self.command_timeout,  # Query execution timeout
+            max_inactive_connection_lifetime=300.0,  # 5 minutes
+            # Prepared statements kept per connection; a lifetime of 0 never expires them
+            statement_cache_size=self.statement_cache_size,
+            max_cached_statement_lifetime=self.max_cached_statement_lifetime
         )
         return self
 
@@ -52,32 +71,71 @@ class DatabaseClient:
         if self._pool:
             await self._pool.close()
 
-    async def fetch_all(self, query: str, *args):
-        """Execute a query and return all results"""
+    def connection(self):
+        """Acquire one pool connection to share across several queries"""
         if not self._pool:
             raise RuntimeError("Database pool not initialized")
-        async with self._pool.acquire() as connection:
+        return self._pool.acquire()
+
+    async def fetch_all(self, query: str, *args):
+        """Execute a query and return all results"""
+        async with self.connection() as connection:
             return await connection.fetch(query, *args)
 
     async def fetch_one(self, query: str, *args):
         """Execute a query and return one result"""
-        if not self._pool:
-            raise RuntimeError("Database pool not initialized")
-        async with self._pool.acquire() as connection:
+        async with self.connection() as connection:
             return await connection.fetchrow(query, *args)
 
     async def execute(self, query: str, *args):
         """Execute a query without returning results"""
-        if not self._pool:
-            raise RuntimeError("Database pool not initialized")
-        async with self._pool.acquire() as connection:
+        async with self.connection() as connection:
             return await connection.execute(query, *args)
 
+    async def execute_many(self, query: str, args):
+        """Execute a query for each set of arguments in one transaction"""
+        async with self.connection() as connection:
+            async with connection.transaction():
+                return await connection.executemany(query, args)
+
+    async def copy_records(self, table: str, records, columns):
+        """Stream records into a table with COPY in one transaction"""
+        async with self.connection() as connection:
+            async with connection.transaction():
+                return await connection.copy_records_to_table(
+                    table, records=records, columns=columns
+                )
+
+    async def iterate(self, query: str, *args, prefetch: int = 500):
+        """Yield rows from a server-side cursor, fetching prefetch rows at a time"""
+        async with self.connection() as connection:
+            async with connection.transaction():
+                async for record in connection.cursor(query, *args, prefetch=prefetch):
+                    yield record
+
+logger = logging.getLogger("users")
+
 # Connect to PostgresDatabase
-database_client = DatabaseClient(settings.DATABASE_URL)
+database_client = DatabaseClient(
+    settings.DATABASE_URL,
+    min_size=settings.db_pool_min_size,
+    max_size=settings.db_pool_max_size,
+    timeout=settings.DB_POOL_TIMEOUT
+)
 
 # Redis Key
-USER_KEY = "users"  # Redis key to store all users as JSON objects
+# Each key kind gets its own prefix so an id can never collide with another key
+USER_KEY = "users"
+USER_ID_KEY = f"{USER_KEY}:id"  # Redis key prefix for cached users by id
+USER_IDS_KEY = f"{USER_KEY}:ids"  # Redis set of every user id, present while the full list is cached
+USER_EMAIL_KEY = f"{USER_KEY}:email"  # Redis key prefix mapping email -> user id
+USER_CACHE_TTL = 60 * 5  # Seconds a cached user stays fresh
+
+# Batches at least this large are inserted with COPY instead of executemany
+BULK_COPY_THRESHOLD = 100
+
+# Columns a PATCH may change, in patch_user parameter order
+PATCHABLE_FIELDS = ("first_name", "last_name", "email", "is_active")
 
 class Role(Enum):
     ADMIN = "admin"
@@ -91,16 +149,26 @@ class User(BaseModel):
     email: EmailStr
     role: Role = Role.USER
     is_active: bool = True
-    created_at: datetime = Field(default_factory=lambda: datetime.now().isoformat())
-    updated_at: datetime = Field(default_factory=lambda: datetime.now().isoformat())
+    # Set by the database (DEFAULT now() / update trigger)
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
 class UserExternal(BaseModel):
     first_name: str
     last_name: str
     email: EmailStr
     is_active: bool
-    created_at: datetime
-    updated_at: datetime
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class UserPatch(BaseModel):
+    # Only PATCHABLE_FIELDS; anything else is rejected
+    model_config = ConfigDict(extra="forbid")
+
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    is_active: Optional[bool] = None
 
 class UserInterface(ABC):
     @abstractmethod
@@ -111,10 +179,18 @@ class UserInterface(ABC):
     def create_user(self, user: User):
         pass
 
+    @abstractmethod
+    def bulk_create_users(self, users: list[User]):
+        pass
+
     @abstractmethod
     def update_user(self, user_id: str, user: User):
         pass
 
+    @abstractmethod
+    def patch_user(self, user_id: str, updates: dict):
+        pass
+
     @abstractmethod
     def deactivate_user(self, user_id: str):
         pass
@@ -127,146 +203,259 @@ class UserInterface(ABC):
     def get_user_by_email(self, email: EmailStr):
         pass
 
+# SQL
+USER_COLUMNS: Final[str] = "id, first_name, last_name, email, is_active, created_at, updated_at"
+SQL_GET_ALL_USERS: Final[str] = f"SELECT {USER_COLUMNS} FROM users"
+SQL_GET_USER_BY_ID: Final[str] = f"SELECT {USER_COLUMNS} FROM users WHERE id = $1"
+SQL_GET_USER_BY_EMAIL: Final[str] = f"SELECT {USER_COLUMNS} FROM users WHERE email = $1"
+# created_at/updated_at come from column defaults and the users_set_updated_at trigger
+SQL_INSERT_USER: Final[str] = (
+    "INSERT INTO users (id, first_name, last_name, email, is_active) VALUES ($1, $2, $3, $4, $5) "
+    "RETURNING created_at, updated_at"
+)
+SQL_UPDATE_USER: Final[str] = (
+    "UPDATE users SET first_name = $1, last_name = $2, email = $3, is_active = $4 WHERE id = $5"
+)
+SQL_DEACTIVATE_USER: Final[str] = "UPDATE users SET is_active = false WHERE id = $1"
+
 class UserPostgresRepository(UserInterface):
     def __init__(self, database_client: DatabaseClient):
         self.database_client = database_client
 
     async def get_all_users(self):
-        return await self.database_client.fetch_all("""
-            SELECT * FROM users
-        """)  
+        return await self.database_client.fetch_all(SQL_GET_ALL_USERS)
+
+    async def stream_all_users(self):
+        async for record in self.database_client.iterate(SQL_GET_ALL_USERS):
+            yield record
 
     async def create_user(self, user: User):
-        return await self.database_client.execute("""
-            INSERT INTO users (id, first_name, last_name, email, is_active, created_at, updated_at) 
-            VALUES ($1, $2, $3, $4, $5, $6, $7)
-        """, user.id, user.first_name, user.last_name, user.email, user.is_active, user.created_at, user.updated_at)
+        return await self.database_client.fetch_one(
+            SQL_INSERT_USER,
+            user.id, user.first_name, user.last_name, user.email, user.is_active
+        )
+
+    async def bulk_create_users(self, users: list[User]):
+        columns = ["id", "first_name", "last_name", "email", "is_active"]
+        records = [
+            (user.id, user.first_name, user.last_name, user.email, user.is_active)
+            for user in users
+        ]
+        if len(records) >= BULK_COPY_THRESHOLD:
+            return await self.database_client.copy_records("users", records, columns)
+        return await self.database_client.execute_many(SQL_INSERT_USER, records)
 
     async def update_user(self, user_id: str, user: User):
-        return await self.database_client.execute("""
-            UPDATE users 
-            SET first_name = $1, last_name = $2, email = $3, is_active = $4, updated_at = $5 
-            WHERE id = $6
-        """, user.first_name, user.last_name, user.email, user.is_active, user.updated_at, user_id)
+        return await self.database_client.execute(
+            SQL_UPDATE_USER,
+            user.first_name, user.last_name, user.email, user.is_active, user_id
+        )
+
+    async def patch_user(self, user_id: str, updates: dict):
+        # Column names only ever come from the whitelist; values are bound as parameters
+        fields = [field for field in PATCHABLE_FIELDS if field in updates]
+        assignments = [f"{field} = ${i}" for i, field in enumerate(fields, start=2)]
+        assignments.append("updated_at = now()")
+        query = f"UPDATE users SET {', '.join(assignments)} WHERE id = $1 RETURNING {USER_COLUMNS}"
+        return await self.database_client.fetch_one(
+            query, user_id, *(updates[field] for field in fields)
+        )
 
     async def deactivate_user(self, user_id: str):
-        return await self.database_client.execute("""
-            UPDATE users 
-            SET is_active = false 
-            WHERE id = $1
-        """, user_id)
+        return await self.database_client.execute(SQL_DEACTIVATE_USER, user_id)
 
     async def get_user_by_id(self, user_id: str):
-        return await self.database_client.fetch_one("""
-            SELECT * FROM users 
-            WHERE id = $1
-        """, user_id)
+        return await self.database_client.fetch_one(SQL_GET_USER_BY_ID, user_id)
 
     async def get_user_by_email(self, email: EmailStr):
-        return await self.database_client.fetch_one("""
-            SELECT * FROM users 
-            WHERE email = $1
-        """, email)
+        return await self.database_client.fetch_one(SQL_GET_USER_BY_EMAIL, email)
 
 def get_user_postgres_repository(database_client: DatabaseClient):
     return UserPostgresRepository(database_client)
 
-# class UserRedisCacheRepository(UserInterface):
-#     def __init__(self, redis_client: Redis, ttl: int = 60 * 60 * 24):
-#         self.redis_client = redis_client
-#         self.ttl = ttl
- 
-#     async def get_all_users(self):
-#         keys = await self.redis_client.keys(f"{USER_KEY}:{function_name}*")
-#         users = [await self.redis_client.json().get(key) for key in keys]
-#         return {"users": users}
-
-#     async def create_user(self, user: User):
-#         user_id = user.id
-#         user_data = user.dict()
-#         await self.redis_client.json().set(f"{USER_KEY}:{user_id}", ".", user_data)
-#         return {"message": "User created successfully", "user": user_data}
-
-#     async def update_user(self, user_id: str, user: User):
-#         user_data = user.dict()
-#         await self.redis_client.json().set(f"{USER_KEY}:{user_id}", ".", user_data)
-#         return {"message": "User updated successfully", "user": user_data}
-
-#     async def deactivate_user(self, user_id: str):
-#         user_data = await self.redis_client.json().get(f"{USER_KEY}:{user_id}")
-#         if not user_data:
-#             raise HTTPException(status_code=404, detail="User not found")
-#         user_data["is_active"] = False
-#         await self.redis_client.json().set(f"{USER_KEY}:{user_id}", ".", user_data)
-#         return {"message": "User deactivated successfully", "user": user_data}
-
-#     async def get_user_by_id(self, user_id: str):
-#         user_data = await self.redis_client.json().get(f"{USER_KEY}:{user_id}")
-#         if not user_data:
-#             raise HTTPException(status_code=404, detail="User not found")
-#         return user_data
-
-#     async def get_user_by_email(self, email: EmailStr):
-#         keys = await self.redis_client.keys(f"{USER_KEY}:*")
-#         users = [await self.redis_client.json().get(key) for key in keys if await self.redis_client.json().get(key)["email"] == email]
-#         return {"users": users}
-
-# def get_user_redis_repository(redis_client: Redis):
-#     return UserRedisCacheRepository(redis_client)
+class UserRedisCacheRepository:
+    def __init__(self, redis_client: Redis, ttl: int = USER_CACHE_TTL):
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+    async def _get(self, key: str):
+        try:
+            value = await self.redis_client.get(key)
+        except RedisError as e:
+            # Treat an unavailable cache as a miss
+            logger.warning("Cache read failed for %s: %s", key, e)
+            return None
+        return orjson.loads(value) if value is not None else None
+
+    async def _set(self, key: str, value):
+        try:
+            await self.redis_client.set(key, orjson.dumps(value, default=str), ex=self.ttl)
+        except RedisError as e:
+            logger.warning("Cache write failed for %s: %s", key, e)
+
+    async def _set_many(self, values: dict):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for key, value in values.items():
+                pipe.set(key, orjson.dumps(value, default=str), ex=self.ttl)
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning("Cache write failed for %s: %s", ", ".join(values), e)
+
+    async def get_all_users(self):
+        # The list is served from the per-user keys: SMEMBERS of the id set, then one MGET.
+        # A missing user key means it was invalidated or expired, i.e. a miss.
+        try:
+            user_ids = await self.redis_client.smembers(USER_IDS_KEY)
+            if not user_ids:
+                return None
+            values = await self.redis_client.mget([f"{USER_ID_KEY}:{user_id}" for user_id in user_ids])
+        except RedisError as e:
+            logger.warning("Cache read failed for %s: %s", USER_IDS_KEY, e)
+            return None
+        if None in values:
+            return None
+        return [orjson.loads(value) for value in values]
+
+    async def set_all_users(self, users: list):
+        if not users:
+            return
+        try:
+            # One MULTI, so readers never see a partial id set
+            pipe = self.redis_client.pipeline()
+            for user in users:
+                pipe.set(f"{USER_ID_KEY}:{user['id']}", orjson.dumps(user, default=str), ex=self.ttl)
+            pipe.delete(USER_IDS_KEY)
+            pipe.sadd(USER_IDS_KEY, *(user["id"] for user in users))
+            pipe.expire(USER_IDS_KEY, self.ttl)
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning("Cache write failed for %s: %s", USER_IDS_KEY, e)
+
+    async def get_user_by_id(self, user_id: str):
+        return await self._get(f"{USER_ID_KEY}:{user_id}")
+
+    async def set_user(self, user_id: str, user: dict):
+        await self._set(f"{USER_ID_KEY}:{user_id}", user)
+
+    async def get_user_id_by_email(self, email: EmailStr):
+        return await self._get(f"{USER_EMAIL_KEY}:{email}")
+
+    async def set_user_by_email(self, email: EmailStr, user: dict):
+        await self._set_many({
+            f"{USER_EMAIL_KEY}:{email}": user["id"],
+            f"{USER_ID_KEY}:{user['id']}": user,
+        })
+
+    async def invalidate_all_users(self):
+        try:
+            await self.redis_client.delete(USER_IDS_KEY)
+        except RedisError as e:
+            logger.warning("Cache invalidation failed for %s: %s", USER_IDS_KEY, e)
+
+    async def invalidate_user(self, user_id: str):
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.delete(f"{USER_ID_KEY}:{user_id}")
+            pipe.delete(USER_IDS_KEY)
+            await pipe.execute()
+        except RedisError as e:
+            logger.warning("Cache invalidation failed for user %s: %s", user_id, e)
+
+def get_user_redis_repository(redis_client: Redis):
+    return UserRedisCacheRepository(redis_client)
 
 class UserService(UserInterface):
     def __init__(self, 
         user_db_repository: UserPostgresRepository,
-        # user_cache_repository: UserRedisCacheRepository
+        user_cache_repository: UserRedisCacheRepository
     ):
         self.user_db_repository = user_db_repository
-        # self.user_cache_repository = user_cache_repository
+        self.user_cache_repository = user_cache_repository
 
     async def create_user(self, user: User):
-        return await self.user_db_repository.create_user(user)
+        result = await self.user_db_repository.create_user(user)
+        await self.user_cache_repository.invalidate_user(user.id)
+        return result
+
+    async def bulk_create_users(self, users: list[User]):
+        result = await self.user_db_repository.bulk_create_users(users)
+        await self.user_cache_repository.invalidate_all_users()
+        return result
 
     async def get_all_users(self):
-        return await self.user_db_repository.get_all_users()
+        users = await self.user_cache_repository.get_all_users()
+        if users is None:
+            users = [dict(row) for row in await self.user_db_repository.get_all_users()]
+            await self.user_cache_repository.set_all_users(users)
+        return users
+
+    async def stream_all_users(self):
+        async for record in self.user_db_repository.stream_all_users():
+            yield dict(record)
 
     async def update_user(self, user_id: str, user: User):
-        return await self.user_db_repository.update_user(user_id, user)
+        result = await self.user_db_repository.update_user(user_id, user)
+        await self.user_cache_repository.invalidate_user(user_id)
+        return result
+
+    async def patch_user(self, user_id: str, updates: dict):
+        row = await self.user_db_repository.patch_user(user_id, updates)
+        await self.user_cache_repository.invalidate_user(user_id)
+        return dict(row) if row is not None else None
 
     async def deactivate_user(self, user_id: str):
-        return await self.user_db_repository.deactivate_user(user_id)
+        result = await self.user_db_repository.deactivate_user(user_id)
+        await self.user_cache_repository.invalidate_user(user_id)
+        return result
 
     async def get_user_by_id(self, user_id: str):
-        return await self.user_db_repository.get_user_by_id(user_id)
+        user = await self.user_cache_repository.get_user_by_id(user_id)
+        if user is None:
+            row = await self.user_db_repository.get_user_by_id(user_id)
+            if row is None:
+                return None
+            user = dict(row)
+            await self.user_cache_repository.set_user(user_id, user)
+        return user
 
     async def get_user_by_email(self, email: EmailStr):
-        return await self.user_db_repository.get_user_by_email(email)
-
-def get_user_service(db_repository: UserPostgresRepository):
-    return UserService(db_repository)
-
-# dependencies
-def get_user_service_dependency(request: Request):
-    user_service = request.app.state.user_service
-    if not user_service:
-        raise HTTPException(status_code=500, detail="User service not initialized")
-    return user_service
+        user_id = await self.user_cache_repository.get_user_id_by_email(email)
+        if user_id is not None:
+            user = await self.get_user_by_id(user_id)
+            # The index entry is stale if the user has since changed email
+            if user is not None and user["email"] == email:
+                return user
+
+        row = await self.user_db_repository.get_user_by_email(email)
+        if row is None:
+            return None
+        user = dict(row)
+        await self.user_cache_repository.set_user_by_email(email, user)
+        return user
+
+def get_user_service(
+    db_repository: UserPostgresRepository,
+    cache_repository: UserRedisCacheRepository
+):
+    return UserService(db_repository, cache_repository)
 
 async def lifespan(app: FastAPI):   
+    await database_client.initialize()
     redis_client = Redis.from_url(
         settings.REDIS_URL,
         decode_responses=True,
         socket_timeout=10.0,
-        retry_on_timeout=True
+        retry_on_timeout=True,
+        health_check_interval=30
     )
     app.state.user_service = get_user_service(
-        get_user_postgres_repository(database_client)
-        # get_user_redis_repository(redis_client)
+        get_user_postgres_repository(database_client),
+        get_user_redis_repository(redis_client)
     )
-    app.state.rate_limiter = RateLimitMiddleware(
+    app.state.rate_limiter = RateLimiter(
         redis_client=redis_client,
-        requests_per_minute=settings.RATE_LIMIT_REQUESTS
-    )
-    app.state.logger = LoggerMiddleware(
-        app_name="users"
+        requests=settings.RATE_LIMIT_REQUESTS
     )
     app.state.publisher = EventPublisher(
         event_types=UserEvents,
@@ -274,18 +463,29 @@ async def lifespan(app: FastAPI):
         channel=Topics.USERS
     )
 
+    # A subscribed connection can't serve other commands, so pub/sub gets its own
+    # client; no socket_timeout here since listen() blocks between messages
+    subscriber_redis = Redis.from_url(settings.REDIS_URL, decode_responses=True)
     app.state.subscriber = EventSubscriber(
         event_types=UserEvents,
-        redis_client=redis_client,
+        redis_client=subscriber_redis,
         channel=Topics.USERS
     )
+    # Fire-and-forget publishes still in flight
+    app.state.background_tasks = set()
+
     await app.state.subscriber.start_background()
     yield
+    if app.state.background_tasks:
+        await asyncio.gather(*app.state.background_tasks, return_exceptions=True)
     await app.state.subscriber.stop()
+    await subscriber_redis.close()
+    await redis_client.close()
+    await database_client.close()
 
 def create_app():
     # Initialize FastAPI
-    app = FastAPI(lifespan=lifespan)
+    app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
     app.add_middleware(
         CORSMiddleware,
@@ -295,18 +495,24 @@ def create_app():
         allow_headers=["*"],
     )
 
-    @app.middleware("http")
-    async def rate_limit_middleware(request: Request, call_next: Callable):
-        return await app.state.rate_limiter(request, call_next)
-    
-    @app.middleware("http")
-    async def logger_middleware(request: Request, call_next: Callable):
-        return await app.state.logger(request, call_next)
-    
+    app.add_middleware(RateLimitMiddleware)
+    app.add_middleware(LoggerMiddleware, app_name="users", log_level=settings.LOG_LEVEL.upper())
+
     return app
 
 app = create_app()
 
+def publish_in_background(event_type: str, data):
+    """Publish an event without making the request wait for Redis"""
+    task = asyncio.create_task(app.state.publisher.publish(event_type, data))
+    app.state.background_tasks.add(task)
+    task.add_done_callback(_on_publish_done)
+
+def _on_publish_done(task: asyncio.Task):
+    app.state.background_tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Event publish failed: %r", task.exception())
+
 @app.get("/health", tags=["general"])
 async def health():
     # TODO: return the health of the service
@@ -318,33 +524,95 @@ async def metrics():
     return {"status": "ok"}
 
 
+def etag_part(value) -> str:
+    # Cached rows hold orjson's ISO strings, fresh rows hold datetimes; both must tag the same
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def make_etag(*parts) -> str:
+    digest = hashlib.blake2b(":".join(map(etag_part, parts)).encode(), digest_size=8).hexdigest()
+    return f'"{digest}"'
+
+def set_cache_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, max-age=30"
+
 # Create User
 @app.post("/users", status_code=201, tags=["users"])
 async def create_user(
     user: UserExternal, 
 ):
-    user_data = User(**user.model_dump())
-    await app.state.user_service.create_user(user_data)
-    await app.state.publisher.publish(UserEvents.USER_CREATED, user)
+    # UserExternal is already validated, so skip re-validating into User
+    user_data = User.model_construct(
+        id=str(uuid.uuid4()), **user.model_dump(exclude={"created_at", "updated_at"})
+    )
+    try:
+        row = await app.state.user_service.create_user(user_data)
+    except asyncpg.UniqueViolationError:
+        raise HTTPException(status_code=409, detail="Email already in use")
+    user_data.created_at = row["created_at"]
+    user_data.updated_at = row["updated_at"]
+    dumped = user_data.model_dump(mode="json")
+    publish_in_background(UserEvents.REGISTERED, dumped)
     return {
         "message": "User created successfully", 
         "data": {
-            "user": user.model_dump()
+            "user": dumped
         },
-        "timestamp": datetime.now().isoformat()
+        "timestamp": datetime.now()
+    }
+
+# Bulk Create Users
+@app.post("/users/bulk", status_code=201, tags=["users"])
+async def bulk_create_users(
+    users: list[UserExternal],
+):
+    users_data = [User(**user.model_dump()) for user in users]
+    try:
+        await app.state.user_service.bulk_create_users(users_data)
+    except asyncpg.UniqueViolationError:
+        raise HTTPException(status_code=409, detail="Email already in use")
+    return {
+        "message": "Users created successfully",
+        "data": {
+            "count": len(users_data)
+        },
+        "timestamp": datetime.now()
     }
 
 # Get All Users
 @app.get("/users", tags=["users"])
-async def get_all_users():
-    return await app.state.user_service.get_all_users()
+async def get_all_users(request: Request, response: Response):
+    users = await app.state.user_service.get_all_users()
+    # Count is included so deletes also change the tag
+    etag = make_etag(len(users), max((etag_part(user["updated_at"]) for user in users), default=""))
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    set_cache_headers(response, etag)
+    return users
+
+# Stream All Users as NDJSON, one row at a time
+@app.get("/users/stream", tags=["users"])
+async def stream_all_users():
+    async def rows():
+        async for user in app.state.user_service.stream_all_users():
+            yield orjson.dumps(user, default=str) + b"\n"
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
 
 # Get User by ID
 @app.get("/users/{user_id}", tags=["users"])
 async def get_user(
     user_id: str, 
+    request: Request,
+    response: Response,
 ):
-    return await app.state.user_service.get_user_by_id(user_id)
+    user = await app.state.user_service.get_user_by_id(user_id)
+    if user is None:
+        return None
+    etag = make_etag(user["id"], user["updated_at"])
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    set_cache_headers(response, etag)
+    return user
 
 # Update User
 @app.put("/users/{user_id}", tags=["users"])
@@ -352,22 +620,27 @@ async def update_user(
     user_id: str, 
     updated_user: User, 
 ):
-    return await app.state.user_service.update_user(user_id, updated_user)
+    try:
+        return await app.state.user_service.update_user(user_id, updated_user)
+    except asyncpg.UniqueViolationError:
+        raise HTTPException(status_code=409, detail="Email already in use")
 
 # Partially Update User (PATCH)
 @app.patch("/users/{user_id}", tags=["users"])
 async def patch_user(
     user_id: str, 
-    updates: dict, 
+    updates: UserPatch, 
 ):
-    user = await app.state.user_service.get_user_by_id(user_id)  # Check if the user exists
-    
-    # Apply updates to the user
-    for key, value in updates.items():
-        user[key] = value
-    
-    # Save updated user
-    return await app.state.user_service.update_user(user_id, user)
+    # Fields sent as null keep their current value, as none of the columns are nullable
+    try:
+        user = await app.state.user_service.patch_user(
+            user_id, updates.model_dump(exclude_unset=True, exclude_none=True)
+        )
+    except asyncpg.UniqueViolationError:
+        raise HTTPException(status_code=409, detail="Email already in use")
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 # Delete User
 @app.delete("/users/{user_id}", tags=["users"])
@@ -0,0 +1,8 @@
+-- Covering index for email lookups, so get_user_by_email can be an index-only scan.
+-- CONCURRENTLY cannot run inside a transaction block; apply this file on its own.
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS users_email_uidx
+    ON users (email)
+    INCLUDE (id, first_name, last_name, is_active, created_at, updated_at);
+
+-- Lookups by id rely on the primary key's btree index.
+-- ALTER TABLE users ADD PRIMARY KEY (id);  -- only if the table was created without one